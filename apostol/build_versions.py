@@ -5,43 +5,303 @@ Script to build both versions of the Apostol solutions book:
 2. Solutions only
 """
 
+import errno
+import hashlib
 import os
+import re
 import subprocess
 import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-def modify_flags(show_content=True):
-    """Modify the showcontent flag in apostol.tex"""
-    tex_file = "apostol.tex"
+# Output file, description, and the \if... switches apostol.tex is built with
+BUILDS = [
+    ("apostol_with_problems.pdf", "version with all content", {"showcontent": True}),
+    ("apostol_solutions_only.pdf", "solutions-only version", {"showcontent": False}),
+]
+
+# Non-LaTeX files copied into each private build directory; the .tex sources
+# are written from the bytes read_sources() hashed
+ASSET_PATTERNS = ['*.png', '*.jpg', '*.jpeg', '*.eps']
+
+# Auxiliary files pdflatex/latexmk leave next to apostol.tex
+AUX_EXTENSIONS = {'.aux', '.log', '.toc', '.out', '.fdb_latexmk', '.fls'}
+
+# Previously built PDFs, keyed by a hash of everything that went into them
+CACHE_DIR = Path("output") / ".build_cache"
+
+# Cached PDFs kept per version: the latest build and the one before it
+CACHE_ENTRIES = 2
+
+_INPUT_RE = re.compile(rb'\\(?:input|include)\{([^}]+)\}')
+
+def read_sources(tex_file="apostol.tex"):
+    """Read tex_file and every file it pulls in via \\input/\\include, once each"""
+    sources = {}
+    pending = [Path(tex_file)]
+    while pending:
+        path = pending.pop()
+        if path in sources or not path.is_file():
+            continue
+        sources[path] = path.read_bytes()
+        for name in _INPUT_RE.findall(sources[path]):
+            dep = Path(name.decode('utf-8'))
+            pending.append(dep if dep.suffix else dep.with_suffix('.tex'))
+    return sources
+
+def sources_digest(sources):
+    """Hash the contents of every LaTeX source file"""
+    digest = hashlib.sha256()
+    for path in sorted(sources):
+        digest.update(path.name.encode('utf-8'))
+        digest.update(sources[path])
+    return digest.hexdigest()
+
+def cache_key(flags, source_hash):
+    """Combine the sources hash with the flag state"""
+    key = source_hash + repr(sorted(flags.items()))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def prune_cache(pattern, keep):
+    """Delete all but the keep most recently used files in CACHE_DIR matching pattern"""
+    entries = sorted(CACHE_DIR.glob(pattern), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in entries[keep:]:
+        path.unlink(missing_ok=True)
+
+def recorded_inputs(fls_file):
+    """Return the files a previous build recorded reading, or None if unknown"""
+    try:
+        with open(fls_file, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
     
-    with open(tex_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    build_dir = None
+    cache_dir = CACHE_DIR.resolve()
+    inputs = set()
+    for line in lines:
+        if line.startswith("PWD "):
+            build_dir = Path(line[4:])
+        elif line.startswith("INPUT "):
+            path = Path(line[6:])
+            if build_dir and path.is_relative_to(build_dir):
+                path = path.relative_to(build_dir)
+            if not path.is_absolute():
+                # Staged sources map back to this directory; anything else in
+                # the build directory (.aux, .toc, .fmt) was generated by the run
+                if path.exists():
+                    inputs.add(path)
+            elif not path.is_relative_to(cache_dir):
+                # Memos, formats and TEXMFVAR files are build products; any other
+                # absolute path is a system file, kept even if it has since gone
+                inputs.add(path)
+    return inputs
+
+def changed_inputs(pdf_file, fls_file):
+    """Return the inputs recorded in fls_file, plus this script, modified or removed
+    since the build that wrote it started; None if there is no usable record
+
+    main() sets the saved fls_file's mtime to the time its build read the
+    sources, so an edit saved while that build was running still counts.
+    """
+    inputs = recorded_inputs(fls_file)
+    if not inputs or not pdf_file.exists():
+        return None
+    started = fls_file.stat().st_mtime_ns
+    return {path for path in inputs | {Path(__file__)}
+            if not path.exists() or path.stat().st_mtime_ns >= started}
+
+def make_build_dir(prefix):
+    """Create a scratch build directory, on a RAM-backed tmpfs when available"""
+    # pdflatex rewrites its .aux/.log/.toc/.out files on every pass; keeping them
+    # in memory avoids disk syncs, and only the finished PDF is copied out
+    ram_dir = "/dev/shm"
+    if os.path.isdir(ram_dir) and os.access(ram_dir, os.W_OK):
+        return tempfile.mkdtemp(prefix=prefix, dir=ram_dir)
+    return tempfile.mkdtemp(prefix=prefix)
+
+# Externalized TikZ pictures, shared by both versions and kept between builds
+MEMO_DIR = CACHE_DIR / "memos"
+
+# Marker in apostol.tex ending the part of the preamble dumped into the .fmt
+PREAMBLE_END = r'\csname endofdump\endcsname'
+FORMAT_NAME = "apostol_preamble"
+
+def preamble_format(sources):
+    """Return a precompiled preamble format, regenerating it only when the preamble changed"""
+    content = sources[Path("apostol.tex")].decode('utf-8')
+    preamble_end = content.find(PREAMBLE_END)
+    if preamble_end == -1:
+        return None
     
-    if show_content:
-        # Set flag to show all content (problems, definitions, theorems, techniques)
-        content = content.replace(r'\showcontentfalse', r'\showcontenttrue')
-        content = content.replace(r'\showcontenttrue  % Change this to', r'\showcontenttrue  % Change this to')
-    else:
-        # Set flag to hide all content (show solutions only)
-        content = content.replace(r'\showcontenttrue', r'\showcontentfalse')
-        content = content.replace(r'\showcontentfalse  % Change this to', r'\showcontentfalse  % Change this to')
+    # A format is only loadable by the pdftex binary that dumped it
+    digest = hashlib.sha256(content[:preamble_end].encode('utf-8'))
+    pdftex = shutil.which('pdftex')
+    if pdftex:
+        digest.update(f"{pdftex}:{os.stat(pdftex).st_mtime_ns}".encode('utf-8'))
+    fmt_file = CACHE_DIR / f"{FORMAT_NAME}-{digest.hexdigest()[:16]}.fmt"
+    if fmt_file.exists():
+        return fmt_file
+    # Dumping this preamble already failed once; don't retry it every build
+    failed_marker = fmt_file.with_suffix(".failed")
+    if failed_marker.exists():
+        return None
     
-    with open(tex_file, 'w', encoding='utf-8') as f:
-        f.write(content)
+    build_dir = make_build_dir("apostol-fmt-")
+    try:
+        stage_sources(build_dir, sources)
+        subprocess.run(['pdftex', '-ini', f'-jobname={FORMAT_NAME}', '&pdflatex',
+                        'mylatexformat.ltx', 'apostol.tex'],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       cwd=build_dir, env=tex_env())
+        move_file(Path(build_dir) / f"{FORMAT_NAME}.fmt", fmt_file)
+        return fmt_file
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Warning: could not precompile the preamble, building without it: {e}")
+        print(log_tail(Path(build_dir) / f"{FORMAT_NAME}.log"))
+        failed_marker.touch()
+        print(f"The preamble will not be dumped again until it changes; delete {failed_marker} to retry.")
+        return None
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        # Formats (and failure markers) for older preambles are never used again
+        for old_file in CACHE_DIR.glob(f"{FORMAT_NAME}-*"):
+            if old_file.stem != fmt_file.stem:
+                old_file.unlink(missing_ok=True)
+
+def tex_env():
+    """Environment for TeX runs, sharing one persistent TEXMFVAR across builds"""
+    # Fonts and map files generated by one run are then found by every later
+    # run instead of each scratch build warming its own cache
+    env = dict(os.environ)
+    env.setdefault('TEXMFVAR', str((CACHE_DIR / "texmf-var").resolve()))
+    return env
+
+def log_tail(log_file, lines=40):
+    """Return the last lines of a TeX log, which is where errors end up"""
+    try:
+        with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+            return ''.join(f.readlines()[-lines:])
+    except OSError:
+        return ""
 
-def compile_latex():
+def move_file(source, destination):
+    """Rename source over destination, copying only across filesystems"""
+    try:
+        os.replace(source, destination)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Copy next to destination and rename over it, so a file hard-linked
+        # to the old destination (a cached PDF) is replaced, not rewritten
+        temp_file = Path(destination).with_name(f".{Path(destination).name}.tmp")
+        shutil.copy(source, temp_file)
+        os.replace(temp_file, destination)
+        Path(source).unlink()
+
+def link_file(source, destination):
+    """Hard-link source to destination, copying if the filesystem can't link"""
+    # Leave destination alone if it already is source, so PDF viewers watching
+    # it don't reload and nothing on disk changes
+    if Path(destination).exists() and os.path.samefile(source, destination):
+        return
+    Path(destination).unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy(source, destination)
+
+def stage_sources(build_dir, sources):
+    """Write the already-read LaTeX sources, and copy the other assets, into a
+    private build directory"""
+    # Writing the hashed bytes, rather than copying from disk again, means an
+    # edit made mid-build can't end up cached under the old sources' key
+    for path, data in sources.items():
+        staged = Path(build_dir) / path
+        staged.parent.mkdir(parents=True, exist_ok=True)
+        staged.write_bytes(data)
+    for pattern in ASSET_PATTERNS:
+        for source in Path(".").glob(pattern):
+            shutil.copy2(source, Path(build_dir) / source.name)
+
+def pretex_code(flags):
+    """TeX code run before apostol.tex to set its flags and memoize options"""
+    # {"showcontent": False} becomes \showcontentfalse, and so on for each \if
+    switches = ''.join(f"\\{name}{'true' if value else 'false'}"
+                       for name, value in flags.items())
+    if memo_extractor() is None:
+        # New memos ship as extra pages of the PDF until they are extracted and
+        # pruned, so without the extractor memoization must stay off
+        return r'\def\buildflags{' + switches + r'}\def\memoizeoptions{disable}'
+    # Memos are extracted by main() once every build has finished, not via shell escape
+    memo_dir = MEMO_DIR.resolve().as_posix()
+    return (r'\def\buildflags{' + switches + '}'
+            + r'\def\memoizeoptions{path={dir=' + memo_dir + '}, extract=no}')
+
+def memo_extractor():
+    """Path of memoize's extraction script, or None if it is not installed"""
+    return shutil.which('memoize-extract.pl') or shutil.which('memoize-extract.py')
+
+def extract_memos(build_dir):
+    """Extract the memos recorded during the last run into MEMO_DIR and prune
+    their pages from the build's apostol.pdf; False if that failed
+
+    Must run before apostol.pdf leaves build_dir, and not while another build
+    may be reading MEMO_DIR, since the extractor writes the shared memo files
+    in place.
+    """
+    extractor = memo_extractor()
+    if extractor is None or not (Path(build_dir) / "apostol.mmz").exists():
+        return True
+    result = subprocess.run([extractor, '--prune', 'apostol.mmz'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            cwd=build_dir, env=tex_env())
+    return result.returncode == 0
+
+def compile_latex(build_dir=".", flags=None, use_format=False):
     """Compile the LaTeX document"""
+    # The flag is injected at launch, so apostol.tex itself is never rewritten
+    command = ['latexmk', '-pdf', '-interaction=nonstopmode', '-halt-on-error']
+    if use_format:
+        # Load the dumped preamble instead of re-reading every package
+        command.append(f'-pretex={pretex_code(flags or {})}')
+        command.append(f'-pdflatex=pdflatex -fmt={FORMAT_NAME} %O %P')
+    else:
+        command.append(f'-usepretex={pretex_code(flags or {})}')
     try:
-        # Run pdflatex twice to ensure proper TOC generation
-        subprocess.run(['pdflatex', '-interaction=nonstopmode', 'apostol.tex'], 
-                      check=True, capture_output=True)
-        subprocess.run(['pdflatex', '-interaction=nonstopmode', 'apostol.tex'], 
-                      check=True, capture_output=True)
+        # pdflatex writes everything to apostol.log anyway, so its console
+        # output is discarded rather than buffered in memory
+        # Every build starts in a fresh directory, where the first pass only has
+        # to produce the .aux/.toc files, so always run it with -draftmode to
+        # skip PDF shipout
+        draft = ['pdflatex', '-draftmode', '-interaction=nonstopmode', '-halt-on-error',
+                 '-recorder', '-jobname=apostol']
+        if use_format:
+            draft.append(f'-fmt={FORMAT_NAME}')
+        subprocess.run(draft + [pretex_code(flags or {}) + r'\input{apostol.tex}'],
+                      check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                      cwd=build_dir, env=tex_env())
+        # latexmk reruns pdflatex only until the .aux/.toc files stop changing
+        subprocess.run(command + ['apostol.tex'],
+                      check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                      cwd=build_dir, env=tex_env())
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error compiling LaTeX: {e}")
+        print(f"Error compiling LaTeX: {e}\n{log_tail(Path(build_dir) / 'apostol.log')}")
+        return False
+    except OSError as e:
+        print(f"Error running LaTeX (are latexmk and pdflatex installed?): {e}")
         return False
 
+def build_version(build_dir, sources, flags, fmt_file=None):
+    """Build one version in its own directory; runs in a worker process"""
+    stage_sources(build_dir, sources)
+    if fmt_file:
+        shutil.copy(fmt_file, Path(build_dir) / f"{FORMAT_NAME}.fmt")
+    return compile_latex(build_dir, flags, use_format=fmt_file is not None)
+
 def main():
     print("Building Apostol Solutions Book - Both Versions")
     print("=" * 50)
@@ -55,35 +315,99 @@ def main():
     output_dir = Path("output")
     output_dir.mkdir(exist_ok=True)
     
-    # Version 1: With all content (problem statements, definitions, theorems, techniques)
-    print("\n1. Building version WITH all content...")
-    modify_flags(show_content=True)
-    if compile_latex():
-        shutil.copy("apostol.pdf", output_dir / "apostol_with_problems.pdf")
-        print("✓ Successfully created apostol_with_problems.pdf")
-    else:
-        print("✗ Failed to compile version with all content")
+    CACHE_DIR.mkdir(exist_ok=True)
+    MEMO_DIR.mkdir(exist_ok=True)
     
-    # Version 2: Solutions only (no problems, no definitions/theorems/techniques)
-    print("\n2. Building version WITHOUT all content (solutions only)...")
-    modify_flags(show_content=False)
-    if compile_latex():
-        shutil.copy("apostol.pdf", output_dir / "apostol_solutions_only.pdf")
-        print("✓ Successfully created apostol_solutions_only.pdf")
-    else:
-        print("✗ Failed to compile solutions-only version")
+    # Skip versions with no change to any file pdflatex read for them
+    stale = []
+    for pdf_name, label, flags in BUILDS:
+        changed = changed_inputs(output_dir / pdf_name, CACHE_DIR / f"{Path(pdf_name).stem}.fls")
+        if changed == set():
+            print(f"✓ {pdf_name} is up to date")
+        else:
+            stale.append((pdf_name, label, flags, changed))
+    
+    # Read and hash the sources once; every version's cache key and the
+    # preamble format are derived from this one read. Anything modified from
+    # here on is newer than what gets built
+    started = time.time_ns()
+    sources = read_sources() if stale else {}
+    source_hash = sources_digest(sources)
+    
+    # Reuse a cached PDF when neither the sources nor the flag changed. The
+    # cache key only covers the .tex sources, so a change to anything else
+    # pdflatex read (images, packages, this script) always forces a build
+    pending = []
+    for pdf_name, label, flags, changed in stale:
+        cached_pdf = CACHE_DIR / f"{Path(pdf_name).stem}-{cache_key(flags, source_hash)}.pdf"
+        if cached_pdf.exists() and (changed is None or changed <= sources.keys()):
+            # Mark the entry as recently used so pruning keeps it
+            os.utime(cached_pdf)
+            link_file(cached_pdf, output_dir / pdf_name)
+            print(f"✓ {pdf_name} is up to date (reused cached build)")
+        else:
+            pending.append((pdf_name, label, flags, cached_pdf))
+    
+    # The two versions share no state, so build them side by side, each in
+    # its own copy of the sources
+    build_dirs = [make_build_dir("apostol-build-") for _ in pending]
+    fmt_file = None
+    if pending:
+        fmt_file = preamble_format(sources)
+    
+    if pending:
+        print(f"\n1. Building {len(pending)} version(s) in parallel...")
+    built = []
+    try:
+        with ProcessPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+            futures = {executor.submit(build_version, build_dir, sources, build[2], fmt_file): (build_dir, build)
+                       for build_dir, build in zip(build_dirs, pending)}
+            
+            # Report and clean up failures as soon as they happen
+            for future in as_completed(futures):
+                build_dir, build = futures[future]
+                if future.result():
+                    built.append((build_dir, build))
+                else:
+                    print(f"✗ Failed to compile {build[1]}")
+                    shutil.rmtree(build_dir, ignore_errors=True)
+        
+        # Both versions write identically named memos into the shared MEMO_DIR,
+        # so extract only after every pdflatex run has exited, one build at a
+        # time, and while its apostol.pdf (which holds the new memos as extra
+        # pages until they are pruned) is still in the build directory
+        for build_dir, (pdf_name, label, _, cached_pdf) in built:
+            if not extract_memos(build_dir):
+                print(f"✗ Could not extract memoized pictures for {label}; keeping the previous {pdf_name}")
+                continue
+            move_file(Path(build_dir) / "apostol.pdf", output_dir / pdf_name)
+            link_file(output_dir / pdf_name, cached_pdf)
+            prune_cache(f"{Path(pdf_name).stem}-*.pdf", CACHE_ENTRIES)
+            # pdflatex -recorder lists every file it read; keep the list
+            # for the up-to-date check of the next run
+            fls_file = Path(build_dir) / "apostol.fls"
+            if fls_file.exists():
+                saved_fls = CACHE_DIR / f"{Path(pdf_name).stem}.fls"
+                move_file(fls_file, saved_fls)
+                # Stamp it with when the sources were read, not when it was saved
+                os.utime(saved_fls, ns=(started, started))
+            print(f"✓ Successfully created {pdf_name}")
+    finally:
+        # Build directories live in tmpfs (RAM), so never leave one behind
+        for build_dir in build_dirs:
+            shutil.rmtree(build_dir, ignore_errors=True)
     
-    # Clean up auxiliary files
-    print("\n3. Cleaning up auxiliary files...")
-    aux_files = ['.aux', '.log', '.toc', '.out', '.fdb_latexmk', '.fls', '.synctex.gz']
-    for ext in aux_files:
-        if os.path.exists(f"apostol{ext}"):
-            os.remove(f"apostol{ext}")
+    # Clean up auxiliary files left behind by manual pdflatex runs
+    print("\n2. Cleaning up auxiliary files...")
+    # One directory scan instead of an exists() check per extension
+    for aux_file in Path(".").glob("apostol.*"):
+        if aux_file.suffix in AUX_EXTENSIONS or aux_file.name.endswith(".synctex.gz"):
+            aux_file.unlink(missing_ok=True)
     
     print("\n" + "=" * 50)
     print("Build complete! Check the 'output' directory for:")
-    print("  - apostol_with_problems.pdf")
-    print("  - apostol_solutions_only.pdf")
+    for pdf_name, _, _ in BUILDS:
+        print(f"  - {pdf_name}")
 
 if __name__ == "__main__":
     main()
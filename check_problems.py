@@ -16,78 +16,214 @@ Use --fix flag to automatically fix issues
 Use --detailed flag to show detailed report of all problems
 """
 
+import bisect
+import mmap
 import os
-import re
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Literal markers, located with str.find/str.count rather than the regex engine
+PROBLEMBOX = '\\begin{problembox}'
+PROBLEMBOX_END = '\\end{problembox}'
+STRATEGY = '\\textbf{Strategy:}'
+SOLUTION = '\\textbf{Solution:}'
+QED = '\\qed'
+IMPORTANCE = '\\textbf{Importance:}'
+IMPORTANCE_BEGIN = '\\begin{importance}'
+IMPORTANCE_END = '\\end{importance}'
+# Any of these ends the text of an Importance section
+SECTION_END_TOKENS = ('\\textbf{', '\\begin{', '\\end{')
+# Byte twins for the read-only check path, which scans an mmap of the file
+PROBLEMBOX_BYTES = PROBLEMBOX.encode()
+STRATEGY_BYTES = STRATEGY.encode()
+SOLUTION_BYTES = SOLUTION.encode()
+QED_BYTES = QED.encode()
+
+# (begin, title open, title close, end) tokens delimiting a titled problembox
+BOX_TOKENS = (PROBLEMBOX, '[', ']', PROBLEMBOX_END)
+BOX_TOKENS_BYTES = tuple(token.encode() for token in BOX_TOKENS)
+
+def find_all(text, sub, start: int = 0, end: Optional[int] = None) -> List[int]:
+    """Return the offset of every non-overlapping occurrence of sub in text[start:end].
+
+    Offsets are into text itself. Works on str, bytes and mmap alike, given a
+    sub of the matching type; take len() of the result to count on an mmap,
+    which has no count().
+    """
+    if end is None:
+        end = len(text)
+    positions = []
+    pos = text.find(sub, start, end)
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find(sub, pos + len(sub), end)
+    return positions
+
+def iter_boxes(content, tokens=BOX_TOKENS) -> Iterator[Tuple[int, int, int]]:
+    """Yield (title_start, title_end, box_end) for every titled problembox.
+
+    A box is \\begin{problembox} directly followed by a non-empty [title],
+    closed by the first \\end{problembox} after the title. Boxes are found
+    with a forward scan of find() calls, so content may be a str or (with
+    BOX_TOKENS_BYTES) a bytes-like mmap.
+    """
+    begin, title_open, title_close, end = tokens
+    pos = content.find(begin)
+    while pos != -1:
+        title_start = pos + len(begin)
+        if content[title_start:title_start + 1] == title_open:
+            title_end = content.find(title_close, title_start + 1)
+            if title_end > title_start + 1:
+                box_end = content.find(end, title_end + 1)
+                if box_end != -1:
+                    box_end += len(end)
+                    yield title_start + 1, title_end, box_end
+                    pos = content.find(begin, box_end)
+                    continue
+        # Untitled or unterminated, so not a problem; try the next one
+        pos = content.find(begin, pos + 1)
+
+def unwrapped_importance(content: str, start: int, end: int) -> Iterator[int]:
+    """Yield the offset of each Importance marker in content[start:end] that is
+    not already inside an importance environment.
+
+    Tracks environment depth in one forward scan over the three markers.
+    """
+    depth = 0
+    next_begin = content.find(IMPORTANCE_BEGIN, start, end)
+    next_end = content.find(IMPORTANCE_END, start, end)
+    next_marker = content.find(IMPORTANCE, start, end)
+    while next_marker != -1:
+        if next_begin != -1 and next_begin < next_marker and (next_end == -1 or next_begin < next_end):
+            depth += 1
+            next_begin = content.find(IMPORTANCE_BEGIN, next_begin + len(IMPORTANCE_BEGIN), end)
+        elif next_end != -1 and next_end < next_marker:
+            # A stray \end{importance} does not make the depth negative
+            depth = max(depth - 1, 0)
+            next_end = content.find(IMPORTANCE_END, next_end + len(IMPORTANCE_END), end)
+        else:
+            if depth == 0:
+                yield next_marker
+            next_marker = content.find(IMPORTANCE, next_marker + len(IMPORTANCE), end)
+
+def find_importance_end(content: str, start: int, end: int) -> int:
+    """Return where the Importance text starting at start ends.
+
+    That is the nearest \\textbf{, \\begin{ or \\end{ before end. Without
+    one, the section runs to end, stopping short of a single final newline.
+    """
+    section_end = -1
+    for token in SECTION_END_TOKENS:
+        pos = content.find(token, start, end)
+        if pos != -1 and (section_end == -1 or pos < section_end):
+            section_end = pos
+    if section_end != -1:
+        return section_end
+    if end > start and content[end - 1] == '\n':
+        return end - 1
+    return end
+
+def apply_edits(content: str, edits: List[Tuple[int, int, str]]) -> str:
+    """Apply non-overlapping (start, end, replacement) edits in a single pass."""
+    # The sort is stable, so an added \qed stays ahead of an Importance edit
+    # inserted at the same position
+    edits = sorted(edits, key=lambda edit: (edit[0], edit[1]))
+    parts = []
+    pos = 0
+    for start, end, replacement in edits:
+        assert start >= pos, f"overlapping edits at offset {start}"
+        parts.append(content[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(content[pos:])
+    return ''.join(parts)
 
 class ProblemChecker:
     def __init__(self, directory: str = "apostol", auto_fix: bool = False):
         self.directory = Path(directory)
-        self.issues = []
         self.auto_fix = auto_fix
-        self.fixes_applied = 0
+        # Shared by check_all_files and generate_detailed_report
+        self._chapter_files = None
+        self._problems_by_file = {}
         
     def find_chapter_files(self) -> List[Path]:
-        """Find all ch*.tex files in the directory."""
-        chapter_files = []
-        if self.directory.exists():
-            for file_path in self.directory.glob("ch*.tex"):
-                chapter_files.append(file_path)
-        return sorted(chapter_files)
+        """Find all ch*.tex files in the directory (scanned once per checker)."""
+        if self._chapter_files is None:
+            chapter_files = []
+            if self.directory.exists():
+                # scandir matches names with plain string checks, unlike glob
+                with os.scandir(self.directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("ch") and entry.name.endswith(".tex") and entry.is_file():
+                            chapter_files.append(Path(entry.path))
+            self._chapter_files = sorted(chapter_files)
+        return self._chapter_files
+    
+    def _find_boxes(self, content, tokens=BOX_TOKENS) -> Iterator[Tuple[str, int, int]]:
+        """Yield (title, win_start, win_end) for every problembox, in file order.
+
+        The window runs from the end of the problembox to the next
+        \\begin{problembox} (or end of file); its Strategy/Solution live there.
+        content may be a str or, with the byte tokens, a bytes-like mmap.
+        """
+        # Every problembox start, titled or not, bounds the preceding window
+        box_starts = find_all(content, tokens[0])
+        
+        for title_start, title_end, win_start in iter_boxes(content, tokens):
+            problem_title = content[title_start:title_end]
+            if isinstance(problem_title, bytes):
+                problem_title = problem_title.decode('utf-8', 'replace')
+            problem_title = problem_title.strip()
+            next_box = bisect.bisect_left(box_starts, win_start)
+            win_end = box_starts[next_box] if next_box < len(box_starts) else len(content)
+            yield problem_title, win_start, win_end
     
     def extract_problems(self, file_path: Path) -> List[Dict]:
-        """Extract all problems from a chapter file."""
+        """Extract all problems from a chapter file.
+
+        The file is mapped read-only and scanned as bytes, so checking never
+        copies or decodes the whole file; only titles are decoded.
+        """
         problems = []
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            f = open(file_path, 'rb')
         except Exception as e:
             print(f"Error reading {file_path}: {e}")
             return problems
         
-        # Find all problembox sections
-        problembox_pattern = r'\\begin\{problembox\}\[([^\]]+)\](.*?)\\end\{problembox\}'
-        problembox_matches = re.finditer(problembox_pattern, content, re.DOTALL)
+        with f:
+            # mmap refuses empty files, which have no problems anyway
+            if os.fstat(f.fileno()).st_size == 0:
+                return problems
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                self._extract_from(content, file_path, problems)
         
-        for match in problembox_matches:
-            problem_title = match.group(1).strip()
-            problem_content = match.group(2).strip()
-            
-            # Find the end position of this problembox
-            problembox_end = match.end()
-            
-            # Look for Strategy and Solution after this problembox
-            remaining_content = content[problembox_end:]
-            
-            # Find the next problembox or end of file to limit our search
-            next_problembox = re.search(r'\\begin\{problembox\}', remaining_content)
-            if next_problembox:
-                search_content = remaining_content[:next_problembox.start()]
-            else:
-                search_content = remaining_content
-            
+        return problems
+    
+    def _extract_from(self, content: mmap.mmap, file_path: Path, problems: List[Dict]) -> None:
+        """Append the problems found in a mapped chapter file to problems."""
+        for problem_title, win_start, win_end in self._find_boxes(content, BOX_TOKENS_BYTES):
+            # Look for Strategy and Solution between this problembox and the next
             # Check for Strategy
-            strategy_match = re.search(r'\\textbf\{Strategy:\}', search_content)
-            has_strategy = strategy_match is not None
+            has_strategy = content.find(STRATEGY_BYTES, win_start, win_end) != -1
             
             # Check for Solution
-            solution_match = re.search(r'\\textbf\{Solution:\}', search_content)
-            has_solution = solution_match is not None
+            solution_start = content.find(SOLUTION_BYTES, win_start, win_end)
+            has_solution = solution_start != -1
             
             # Check for \qed - look for it after the solution
             has_qed = False
             qed_count = 0
             extra_qed_issues = []
             
-            if solution_match:
+            if has_solution:
                 # Look for \qed after the solution
-                solution_end = solution_match.end()
-                after_solution = search_content[solution_end:]
-                qed_matches = list(re.finditer(r'\\qed', after_solution))
-                qed_count = len(qed_matches)
+                solution_end = solution_start + len(SOLUTION_BYTES)
+                qed_count = len(find_all(content, QED_BYTES, solution_end, win_end))
                 has_qed = qed_count > 0
                 
                 # Check for extra \qed issues
@@ -97,9 +233,9 @@ class ProblemChecker:
                     extra_qed_issues.append("Missing \\qed")
             else:
                 # Check if there's a \qed without a solution
-                qed_matches = list(re.finditer(r'\\qed', search_content))
-                if qed_matches:
-                    extra_qed_issues.append(f"\\qed without Solution ({len(qed_matches)} found)")
+                without_solution = len(find_all(content, QED_BYTES, win_start, win_end))
+                if without_solution:
+                    extra_qed_issues.append(f"\\qed without Solution ({without_solution} found)")
             
             problems.append({
                 'title': problem_title,
@@ -110,251 +246,184 @@ class ProblemChecker:
                 'extra_qed_issues': extra_qed_issues,
                 'file': file_path.name
             })
-        
-        return problems
     
-    def fix_missing_qed(self, file_path: Path) -> int:
-        """Fix missing \qed in a file and return number of fixes applied."""
-        fixes_applied = 0
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-            return 0
-        
-        # Find all problembox sections
-        problembox_pattern = r'\\begin\{problembox\}\[([^\]]+)\](.*?)\\end\{problembox\}'
-        problembox_matches = list(re.finditer(problembox_pattern, content, re.DOTALL))
+    def _compute_edits(self, content: str, boxes: Iterator[Tuple[str, int, int]],
+                       messages: List[str], has_importance: bool = True
+                       ) -> Tuple[List[Tuple[int, int, str]], int, int, int]:
+        """Decide every fix for a file in a single walk over its problem windows.
+
+        Returns the edits together with the number of (missing \\qed, extra
+        \\qed, Importance) fixes they make. has_importance=False skips the
+        Importance scan for files known to have no Importance sections.
+        """
+        edits = []
+        missing_fixes = extra_fixes = importance_fixes = 0
+        # Messages are grouped by kind of fix, as when each fix was its own pass
+        missing_messages, extra_messages, importance_messages = [], [], []
         
-        # Process from end to beginning to avoid offset issues
-        for match in reversed(problembox_matches):
-            problem_title = match.group(1).strip()
-            problembox_end = match.end()
-            
-            # Look for content after this problembox
-            remaining_content = content[problembox_end:]
-            
-            # Find the next problembox or end of file to limit our search
-            next_problembox = re.search(r'\\begin\{problembox\}', remaining_content)
-            if next_problembox:
-                search_content = remaining_content[:next_problembox.start()]
-            else:
-                search_content = remaining_content
+        for problem_title, win_start, win_end in boxes:
+            # Start offsets of the \qed commands removed from this window
+            deleted = set()
+            solution_start = content.find(SOLUTION, win_start, win_end)
             
-            # Check for Solution
-            solution_match = re.search(r'\\textbf\{Solution:\}', search_content)
-            if solution_match:
+            if solution_start != -1:
                 # Look for \qed after the solution
-                solution_end = solution_match.end()
-                after_solution = search_content[solution_end:]
-                qed_match = re.search(r'\\qed', after_solution)
+                solution_end = solution_start + len(SOLUTION)
+                qed_positions = find_all(content, QED, solution_end, win_end)
                 
-                if not qed_match:
-                    # Find the end of the solution content (before next problembox or end)
-                    # Look for the last non-whitespace character before the next problembox
-                    solution_content = after_solution.rstrip()
+                if not qed_positions:
+                    # Add \qed after the last non-whitespace character of the solution
+                    text_end = win_end
+                    while text_end > solution_end and content[text_end - 1].isspace():
+                        text_end -= 1
                     
-                    if solution_content:
-                        # Find the position in the original content where we need to add \qed
-                        solution_start_in_file = problembox_end + solution_match.end()
-                        solution_end_in_file = solution_start_in_file + len(solution_content)
-                        
-                        # Add \qed at the end of the solution
-                        new_content = (content[:solution_end_in_file] + 
-                                     '\\qed' + 
-                                     content[solution_end_in_file:])
-                        
-                        content = new_content
-                        fixes_applied += 1
-                        print(f"  ✅ Added \\qed to problem: {problem_title}")
-        
-        # Write the fixed content back to file
-        if fixes_applied > 0:
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                print(f"  📝 Updated {file_path.name} with {fixes_applied} fixes")
-            except Exception as e:
-                print(f"  ❌ Error writing {file_path}: {e}")
-                return 0
-        
-        return fixes_applied
-    
-    def fix_extra_qed(self, file_path: Path) -> int:
-        """Fix extra \qed issues in a file and return number of fixes applied."""
-        fixes_applied = 0
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-            return 0
-        
-        # Find all problembox sections
-        problembox_pattern = r'\\begin\{problembox\}\[([^\]]+)\](.*?)\\end\{problembox\}'
-        problembox_matches = list(re.finditer(problembox_pattern, content, re.DOTALL))
-        
-        # Process from end to beginning to avoid offset issues
-        for match in reversed(problembox_matches):
-            problem_title = match.group(1).strip()
-            problembox_end = match.end()
-            
-            # Look for content after this problembox
-            remaining_content = content[problembox_end:]
+                    if text_end > solution_end:
+                        edits.append((text_end, text_end, '\\qed'))
+                        missing_fixes += 1
+                        missing_messages.append(f"  ✅ Added \\qed to problem: {problem_title}")
+                elif len(qed_positions) > 1:
+                    # Multiple \qed found - keep only the first one
+                    deleted.update(qed_positions[1:])
+                    extra_fixes += len(qed_positions) - 1
+                    extra_messages.append(f"  ✅ Removed {len(qed_positions) - 1} extra \\qed from problem: {problem_title}")
             
-            # Find the next problembox or end of file to limit our search
-            next_problembox = re.search(r'\\begin\{problembox\}', remaining_content)
-            if next_problembox:
-                search_content = remaining_content[:next_problembox.start()]
             else:
-                search_content = remaining_content
-            
-            # Check for Solution
-            solution_match = re.search(r'\\textbf\{Solution:\}', search_content)
+                # No solution found - remove any \qed
+                qed_positions = find_all(content, QED, win_start, win_end)
+                if qed_positions:
+                    deleted.update(qed_positions)
+                    extra_fixes += len(qed_positions)
+                    extra_messages.append(f"  ✅ Removed {len(qed_positions)} \\qed without Solution from problem: {problem_title}")
             
-            if solution_match:
-                # Look for \qed after the solution
-                solution_end = solution_match.end()
-                after_solution = search_content[solution_end:]
-                qed_matches = list(re.finditer(r'\\qed', after_solution))
+            # Look for Importance sections that are not already wrapped
+            importance_starts = unwrapped_importance(content, win_start, win_end) if has_importance else ()
+            for importance_start in importance_starts:
+                # The section runs to the next \textbf{, \begin{ or \end{
+                text_start = importance_start + len(IMPORTANCE)
+                text_end = find_importance_end(content, text_start, win_end)
+                if text_end == win_end:
+                    # A newline left last in the window once trailing \qed
+                    # removals apply stays outside the section, as it would
+                    # have without them
+                    visible_end = text_end
+                    while visible_end - len(QED) in deleted:
+                        visible_end -= len(QED)
+                    if text_start < visible_end < text_end and content[visible_end - 1] == '\n':
+                        text_end = visible_end - 1
                 
-                if len(qed_matches) > 1:
-                    # Multiple \qed found - keep only the first one
-                    first_qed_end = qed_matches[0].end()
-                    # Remove all \qed after the first one
-                    content_to_fix = after_solution[first_qed_end:]
-                    fixed_content = re.sub(r'\\qed', '', content_to_fix)
-                    
-                    # Calculate positions in the original content
-                    solution_start_in_file = problembox_end + solution_match.end()
-                    first_qed_end_in_file = solution_start_in_file + first_qed_end
-                    content_end_in_file = solution_start_in_file + len(after_solution)
-                    
-                    # Replace the content
-                    new_content = (content[:first_qed_end_in_file] + 
-                                 fixed_content + 
-                                 content[content_end_in_file:])
-                    
-                    content = new_content
-                    fixes_applied += len(qed_matches) - 1
-                    print(f"  ✅ Removed {len(qed_matches) - 1} extra \\qed from problem: {problem_title}")
+                # Wrap the section and trim the whitespace around its text. This
+                # is done as separate edits at either end so that \qed edits
+                # inside the section still apply. The text is trimmed as it reads
+                # once \qed removals are applied, so a removed \qed next to the
+                # whitespace is trimmed along with it.
+                lead_end = text_start
+                while lead_end < text_end:
+                    if content[lead_end].isspace():
+                        lead_end += 1
+                    elif lead_end in deleted:
+                        deleted.discard(lead_end)
+                        lead_end += len(QED)
+                    else:
+                        break
+                trail_start = text_end
+                while trail_start > lead_end:
+                    if content[trail_start - 1].isspace():
+                        trail_start -= 1
+                    elif trail_start - len(QED) in deleted:
+                        trail_start -= len(QED)
+                        deleted.discard(trail_start)
+                    else:
+                        break
+                
+                edits.append((importance_start, importance_start, IMPORTANCE_BEGIN + '\n'))
+                if lead_end > text_start:
+                    edits.append((text_start, lead_end, ''))
+                edits.append((trail_start, text_end, '\n' + IMPORTANCE_END))
+                importance_fixes += 1
+                importance_messages.append(f"  ✅ Wrapped Importance section in problem: {problem_title}")
             
-            else:
-                # No solution found - remove any \qed
-                qed_matches = list(re.finditer(r'\\qed', search_content))
-                if qed_matches:
-                    # Remove all \qed from this section
-                    fixed_content = re.sub(r'\\qed', '', search_content)
-                    
-                    # Calculate positions in the original content
-                    section_start_in_file = problembox_end
-                    section_end_in_file = problembox_end + len(search_content)
-                    
-                    # Replace the content
-                    new_content = (content[:section_start_in_file] + 
-                                 fixed_content + 
-                                 content[section_end_in_file:])
-                    
-                    content = new_content
-                    fixes_applied += len(qed_matches)
-                    print(f"  ✅ Removed {len(qed_matches)} \\qed without Solution from problem: {problem_title}")
+            # \qed removals not already absorbed into an Importance trim
+            edits.extend((qed_pos, qed_pos + len(QED), '') for qed_pos in sorted(deleted))
         
-        # Write the fixed content back to file
-        if fixes_applied > 0:
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                print(f"  📝 Updated {file_path.name} with {fixes_applied} extra \\qed fixes")
-            except Exception as e:
-                print(f"  ❌ Error writing {file_path}: {e}")
-                return 0
-        
-        return fixes_applied
+        messages.extend(missing_messages)
+        messages.extend(extra_messages)
+        messages.extend(importance_messages)
+        return edits, missing_fixes, extra_fixes, importance_fixes
     
-    def fix_importance_sections(self, file_path: Path) -> int:
-        """Fix Importance sections by wrapping them with \\begin{importance} and \\end{importance}."""
-        fixes_applied = 0
-        
+    def fix_file(self, file_path: Path, messages: List[str]) -> Tuple[int, int, int]:
+        """Fix missing \\qed, extra \\qed and unwrapped Importance sections in one pass.
+
+        Progress lines are appended to messages rather than printed, so files can
+        be fixed from worker threads. Returns the number of (missing \\qed,
+        extra \\qed, Importance) fixes applied.
+        """
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
         except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-            return 0
+            messages.append(f"Error reading {file_path}: {e}")
+            return 0, 0, 0
         
-        # Find all problembox sections
-        problembox_pattern = r'\\begin\{problembox\}\[([^\]]+)\](.*?)\\end\{problembox\}'
-        problembox_matches = list(re.finditer(problembox_pattern, content, re.DOTALL))
+        # Every fix needs a problembox and one of Solution (missing \qed), \qed
+        # (extra \qed) or Importance, so skip files that cannot need any fix
+        has_importance = IMPORTANCE in content
+        if PROBLEMBOX not in content or not (has_importance or SOLUTION in content or QED in content):
+            return 0, 0, 0
         
-        # Process from end to beginning to avoid offset issues
-        for match in reversed(problembox_matches):
-            problem_title = match.group(1).strip()
-            problembox_end = match.end()
-            
-            # Look for content after this problembox
-            remaining_content = content[problembox_end:]
-            
-            # Find the next problembox or end of file to limit our search
-            next_problembox = re.search(r'\\begin\{problembox\}', remaining_content)
-            if next_problembox:
-                search_content = remaining_content[:next_problembox.start()]
-            else:
-                search_content = remaining_content
-            
-            # Look for Importance sections that are not already wrapped
-            importance_pattern = r'\\textbf\{Importance:\}(.*?)(?=\\textbf\{|\\begin\{|\\end\{|$)'
-            importance_matches = list(re.finditer(importance_pattern, search_content, re.DOTALL))
-            
-            for importance_match in reversed(importance_matches):
-                importance_start = importance_match.start()
-                importance_end = importance_match.end()
-                importance_content = importance_match.group(1).strip()
-                
-                # Check if this Importance section is already wrapped
-                # Look backwards from the start to see if there's a \begin{importance}
-                before_importance = search_content[:importance_start]
-                if '\\begin{importance}' not in before_importance[-50:]:  # Check last 50 chars
-                    # Look forwards from the end to see if there's an \end{importance}
-                    after_importance = search_content[importance_end:]
-                    if '\\end{importance}' not in after_importance[:50]:  # Check first 50 chars
-                        # This Importance section needs to be wrapped
-                        
-                        # Calculate positions in the original content
-                        section_start_in_file = problembox_end + importance_start
-                        section_end_in_file = problembox_end + importance_end
-                        
-                        # Wrap the Importance section
-                        wrapped_content = ('\\begin{importance}\n' + 
-                                         '\\textbf{Importance:}' + importance_content + 
-                                         '\n\\end{importance}')
-                        
-                        # Replace the content
-                        new_content = (content[:section_start_in_file] + 
-                                     wrapped_content + 
-                                     content[section_end_in_file:])
-                        
-                        content = new_content
-                        fixes_applied += 1
-                        print(f"  ✅ Wrapped Importance section in problem: {problem_title}")
+        # Decide all fixes in one walk over the problemboxes
+        edits, missing_fixes, extra_fixes, importance_fixes = self._compute_edits(
+            content, self._find_boxes(content), messages, has_importance)
+        if not edits:
+            return 0, 0, 0
         
-        # Write the fixed content back to file
-        if fixes_applied > 0:
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                print(f"  📝 Updated {file_path.name} with {fixes_applied} Importance section fixes")
-            except Exception as e:
-                print(f"  ❌ Error writing {file_path}: {e}")
-                return 0
+        fixed_content = apply_edits(content, edits)
+        if fixed_content == content:
+            return 0, 0, 0
         
-        return fixes_applied
+        # Write the fixed content to a temporary file and move it over the
+        # original, so an interrupted write never leaves a truncated chapter
+        total_fixes = missing_fixes + extra_fixes + importance_fixes
+        tmp_path = file_path.with_name(file_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(fixed_content)
+            shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+            messages.append(f"  📝 Updated {file_path.name} with {total_fixes} fixes")
+        except Exception as e:
+            messages.append(f"  ❌ Error writing {file_path}: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return 0, 0, 0
+        
+        return missing_fixes, extra_fixes, importance_fixes
+    
+    def _process_one(self, file_path: Path) -> Dict:
+        """Check or fix a single file; runs on a worker thread.
+
+        The file's output comes back as one 'report' string for the caller to
+        write out, rather than being printed line by line.
+        """
+        if self.auto_fix:
+            messages = []
+            missing_fixes, extra_fixes, importance_fixes = self.fix_file(file_path, messages)
+            return {
+                'report': ''.join(f"{message}\n" for message in messages),
+                'missing_fixes': missing_fixes,
+                'extra_fixes': extra_fixes,
+                'importance_fixes': importance_fixes
+            }
+        file_issues, report = self.check_file(file_path)
+        return {'report': report, 'file_issues': file_issues}
     
-    def check_file(self, file_path: Path) -> List[Dict]:
-        """Check a single file for issues."""
+    def check_file(self, file_path: Path) -> Tuple[List[Dict], str]:
+        """Check a single file for issues.
+
+        Returns the issues and the report section listing them ('' if none).
+        """
         problems = self.extract_problems(file_path)
+        # Keep the problems for the detailed report
+        self._problems_by_file[file_path] = problems
         file_issues = []
         
         for problem in problems:
@@ -376,7 +445,16 @@ class ProblemChecker:
                     'issues': issues
                 })
         
-        return file_issues
+        if not file_issues:
+            return file_issues, ''
+        
+        lines = [f"\n📁 {file_path.name}", "-" * 40]
+        for issue in file_issues:
+            lines.append(f"  ❌ Problem: {issue['problem']}")
+            for problem_issue in issue['issues']:
+                lines.append(f"     • {problem_issue}")
+        lines.append('')
+        return file_issues, '\n'.join(lines)
     
     def check_all_files(self) -> None:
         """Check all chapter files and report issues."""
@@ -395,10 +473,16 @@ class ProblemChecker:
             total_importance_fixes = 0
             files_fixed = 0
             
-            for file_path in chapter_files:
-                missing_fixes = self.fix_missing_qed(file_path)
-                extra_fixes = self.fix_extra_qed(file_path)
-                importance_fixes = self.fix_importance_sections(file_path)
+            # Files are independent, so process them concurrently; each result
+            # carries its report, and all reports are written here in order
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                results = list(executor.map(self._process_one, chapter_files))
+            sys.stdout.write(''.join(result['report'] for result in results))
+            
+            for result in results:
+                missing_fixes = result['missing_fixes']
+                extra_fixes = result['extra_fixes']
+                importance_fixes = result['importance_fixes']
                 
                 if missing_fixes > 0 or extra_fixes > 0 or importance_fixes > 0:
                     files_fixed += 1
@@ -427,19 +511,17 @@ class ProblemChecker:
             total_issues = 0
             files_with_issues = 0
             
-            for file_path in chapter_files:
-                file_issues = self.check_file(file_path)
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                results = list(executor.map(self._process_one, chapter_files))
+            sys.stdout.write(''.join(result['report'] for result in results))
+            
+            for result in results:
+                file_issues = result['file_issues']
                 
                 if file_issues:
                     files_with_issues += 1
-                    print(f"\n📁 {file_path.name}")
-                    print("-" * 40)
-                    
                     for issue in file_issues:
                         total_issues += len(issue['issues'])
-                        print(f"  ❌ Problem: {issue['problem']}")
-                        for problem_issue in issue['issues']:
-                            print(f"     • {problem_issue}")
             
             # Summary
             print("\n" + "=" * 60)
@@ -469,7 +551,9 @@ class ProblemChecker:
         complete_problems = 0
         
         for file_path in chapter_files:
-            problems = self.extract_problems(file_path)
+            problems = self._problems_by_file.get(file_path)
+            if problems is None:
+                problems = self.extract_problems(file_path)
             if not problems:
                 continue
                 